@@ -112,6 +112,19 @@ void SimpleKalman::getFilteredState(const double x, const double y, const double
 	result[2] = estimateState[2];
 }
 
+void SimpleKalman::getPredictedState(const double lead, const double maxOffset, double result[3]) const
+{
+	// extrapolate with the estimated velocity, capped to avoid overshooting on sudden stops
+	Matrix<double, 3, 1> offset = estimateState.tail<3>() * lead;
+	double norm = offset.norm();
+	if (norm > maxOffset) {
+		offset *= maxOffset / norm;
+	}
+	result[0] = estimateState[0] + offset[0];
+	result[1] = estimateState[1] + offset[1];
+	result[2] = estimateState[2] + offset[2];
+}
+
 void SimpleKalman::predict()
 {
 	estimateState = A*estimateState + B*u;
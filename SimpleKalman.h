@@ -38,6 +38,7 @@ public:
 
 	void init(const double x, const double y, const double z); // x,y,z : initial joint position
 	void getFilteredState(const double x, const double y, const double z, double result[3]); // x,y,z : measured position, result : filtered position vector
+	void getPredictedState(const double lead, const double maxOffset, double result[3]) const; // lead : extrapolation time, maxOffset : max extrapolated distance, result : predicted position vector
 
 private:
 	Matrix<double, 6, 6> A, Ex, P, I;
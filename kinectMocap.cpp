@@ -40,6 +40,8 @@ int initSensor(double inDt, double inSensorNoise, double inUNoise) {
 	dt = inDt;
 	sensorNoise = inSensorNoise;
 	uNoise = inUNoise;
+	predictionLead = 0;
+	predictionMaxOffset = 0;
 
 	hr = GetDefaultKinectSensor(&m_pKinectSensor);
 	if (FAILED(hr)) {
@@ -117,6 +119,16 @@ int applyKalman(int jointNumber) {
 	return 0;
 }
 
+// get joint position, extrapolated if prediction is enabled
+tuple getJointState(int jointNumber) {
+	if (predictionLead > 0 && kalman[jointNumber]) {
+		double result[3];
+		kalman[jointNumber]->getPredictedState(predictionLead, predictionMaxOffset, result);
+		return make_tuple(result[0], result[1], result[2], static_cast<int>(joints[jointNumber].TrackingState));
+	}
+	return make_tuple(joints[jointNumber].Position.X, joints[jointNumber].Position.Y, joints[jointNumber].Position.Z, static_cast<int>(joints[jointNumber].TrackingState));
+}
+
 // get frame (updates joints)
 int updateFrame() {
 	
@@ -166,6 +178,7 @@ int updateFrame() {
 								double depth = joints[j].Position.Z * cos(tilt) - joints[j].Position.Y * sin(tilt);
 								joints[j].Position.Y = height;
 								joints[j].Position.Z = depth;
+								rawJoints[j] = joints[j];
 
 								// apply kalman filter to each joint
 								applyKalman(j);
@@ -185,10 +198,12 @@ int updateFrame() {
 }
 
 struct Sensor {
-	tuple getJoint(int jointNumber) { return make_tuple(joints[jointNumber].Position.X, joints[jointNumber].Position.Y, joints[jointNumber].Position.Z, static_cast<int>(joints[jointNumber].TrackingState)); }
+	tuple getJoint(int jointNumber) { return getJointState(jointNumber); }
+	tuple getRawJoint(int jointNumber) { return make_tuple(rawJoints[jointNumber].Position.X, rawJoints[jointNumber].Position.Y, rawJoints[jointNumber].Position.Z, static_cast<int>(rawJoints[jointNumber].TrackingState)); }
 	int init(double dt, double sNoise, double uNois) { return initSensor(dt, sNoise, uNois); }
 	int close() { return closeSensor(); }
 	int update() { return updateFrame(); }
+	void setPrediction(double lead, double maxOffset) { predictionLead = lead; predictionMaxOffset = maxOffset; }
 };
 
 BOOST_PYTHON_MODULE(kinectMocap4Blender) {
@@ -197,5 +212,7 @@ BOOST_PYTHON_MODULE(kinectMocap4Blender) {
 		.def("close", &Sensor::close)
 		.def("update", &Sensor::update)
 		.def("getJoint", &Sensor::getJoint)
+		.def("getRawJoint", &Sensor::getRawJoint)
+		.def("setPrediction", &Sensor::setPrediction)
 	;
 }
\ No newline at end of file
@@ -34,6 +34,7 @@ IKinectSensor*          m_pKinectSensor;
 double					tilt;
 
 Joint					joints[JointType_Count];
+Joint					rawJoints[JointType_Count]; // joints before filtering
 
 // Body reader
 IBodyFrameReader*       m_pBodyFrameReader;
@@ -42,5 +43,8 @@ IBodyFrameReader*       m_pBodyFrameReader;
 SimpleKalman*			kalman[25];
 double					sensorNoise, uNoise;
 
+// forward prediction (0 : disabled)
+double					predictionLead, predictionMaxOffset;
+
 // store framerate
 double					dt;
\ No newline at end of file
@@ -23,7 +23,7 @@ bl_info = {
     "name": "Kinect Motion Capture plugin",
     "description": "Motion capture using MS Kinect v2",
     "author": "Morgane Dufresne",
-    "version": (1, 4),
+    "version": (1, 5),
     "blender": (2, 80, 0),
     "support": "COMMUNITY",
     "category": "Animation"
@@ -31,10 +31,35 @@ bl_info = {
 
 import bpy
 import functools
-import kinectMocap4Blender
+import gpu
+from gpu_extras.batch import batch_for_shader
+import base64
+import importlib
+import math
+import numpy
+import random
+import select
+import socket
+import struct
+import threading
+import zlib
+from collections import deque
 import mathutils
 from mathutils import Euler, Vector, Quaternion, Matrix
-from time import sleep
+from time import sleep, perf_counter, time as wallTime
+
+# The native module (Kinect SDK) is only imported when a sensor is created,
+# so that starting Blender (e.g. for background renders) doesn't load it.
+nativeModule = None
+startupStats = {"register": 0.0, "nativeImport": 0.0}
+
+def loadNativeModule():
+    global nativeModule
+    if nativeModule is None:
+        start = perf_counter()
+        nativeModule = importlib.import_module("kinectMocap4Blender")
+        startupStats["nativeImport"] = perf_counter() - start
+    return nativeModule
 
 ###############################################
 #                    Properties and misc
@@ -85,14 +110,39 @@ KalmanStrengthEnum = [("Strong", "Strong", "Strong denoising (ideal for slow mov
     ("VeryLow", "Very low", "Very low denoising (only for very fast movement, almost no noise reduction")
 ]
 
+# Kalman acceleration noise for each denoising strength
+kalmanNoise = {"Strong": 1.0, "Normal": 5.0, "Low": 20.0, "VeryLow": 50.0}
+# Kalman sensor noise (squared)
+kalmanSensorNoise = 0.0005
+# body frame rate of the Kinect v2
+kinectFps = 30
+
+PredictionEnum = [("Off", "Off", "No forward prediction"),
+    ("Manual", "Manual", "Extrapolate the joints by the given latency"),
+    ("Auto", "Auto", "Extrapolate the joints by the given sensor latency plus the measured capture loop latency")
+]
+
+SensorBackendEnum = [("Kinect", "Kinect v2", "Live tracking with a Kinect v2 sensor"),
+    ("Synthetic", "Synthetic", "Generated skeleton motion, for stress testing without a sensor"),
+    ("Fusion", "Fusion", "Merge the joint streams of several capture nodes or recorded files")
+]
+
 class KMC_PG_KmcTarget(bpy.types.PropertyGroup):
     name : bpy.props.StringProperty(name="KBone")
     value : bpy.props.StringProperty(name="TBone", update=validateTarget)
 
+class KMC_PG_KmcSource(bpy.types.PropertyGroup):
+    address : bpy.props.StringProperty(name="Source", description="Capture node (host:port) or recorded joint stream file")
+    enabled : bpy.props.BoolProperty(name="Enabled", default=True)
+    location : bpy.props.FloatVectorProperty(name="Location", description="Position of the sensor in the common frame (Kinect space, meters)", size=3, subtype='TRANSLATION')
+    rotation : bpy.props.FloatVectorProperty(name="Rotation", description="Orientation of the sensor in the common frame (Kinect space)", size=3, subtype='EULER')
+    timeOffset : bpy.props.FloatProperty(name="Time offset", description="Delay added to this source's timestamps (seconds)", default=0.0, min=-1.0, max=1.0)
+
 class KMC_PG_KmcProperties(bpy.types.PropertyGroup):
     fps : bpy.props.IntProperty(name="fps", description="Tracking frames per second", default=24, min = 1, max = 60)
     arma_list : bpy.props.EnumProperty(items = armature_callback, name="Armature", default=None)
     targetBones : bpy.props.CollectionProperty(type = KMC_PG_KmcTarget)
+    sources : bpy.props.CollectionProperty(type = KMC_PG_KmcSource)
     isTracking : bpy.props.BoolProperty(name="Tracking status", description="tracking status")
     stopTracking : bpy.props.BoolProperty(name="Stop trigger", description="tells to stop the tracking")
     firstFramePosition : bpy.props.FloatVectorProperty(name="firstFramePosition", description="position of root bone in first frame", size=3)
@@ -102,6 +152,19 @@ class KMC_PG_KmcProperties(bpy.types.PropertyGroup):
     lockDepth : bpy.props.BoolProperty(name="depth", description="ignore depth movement", default=True)
     rootBone : bpy.props.EnumProperty(name="root bone", items=KBonesEnum, default="Spine0", description="Kinect identifier of the bone that is used as root of the skeleton")
     kalmanStrength : bpy.props.EnumProperty(name="Denoising", items=KalmanStrengthEnum, default="Normal")
+    prediction : bpy.props.EnumProperty(name="Prediction", items=PredictionEnum, default="Off", description="Compensate latency by extrapolating the filtered joints")
+    predictionLatency : bpy.props.FloatProperty(name="Latency", description="Extrapolation time (seconds). In auto mode, latency of the sensor itself, added to the measured one", default=0.05, min=0.0, max=0.5)
+    predictionCap : bpy.props.FloatProperty(name="Max offset", description="Maximum extrapolated distance of a joint (meters)", default=0.05, min=0.0, max=0.5)
+    tickBudget : bpy.props.IntProperty(name="Tick budget (ms)", description="Time budget of a capture tick, work is shed when it is exceeded (0 : disabled)", default=0, min=0, max=1000)
+    backend : bpy.props.EnumProperty(name="Source", items=SensorBackendEnum, default="Kinect", description="Where the joint data comes from")
+    synthBodies : bpy.props.IntProperty(name="Bodies", description="Number of generated bodies", default=1, min=1, max=6)
+    synthFps : bpy.props.IntProperty(name="Sensor fps", description="Rate at which the synthetic source produces frames", default=30, min=1, max=120)
+    synthNoise : bpy.props.FloatProperty(name="Noise", description="Standard deviation of the position noise (meters)", default=0.01, min=0.0, max=0.2)
+    synthDropout : bpy.props.FloatProperty(name="Dropouts", description="Probability for a joint to be inferred or lost in a frame", default=0.02, min=0.0, max=1.0, subtype='FACTOR')
+    lightDisplay : bpy.props.BoolProperty(name="Light display", description="While tracking, suspend mesh deformation by the armature and draw stick figures instead", default=False)
+    recordPrecision : bpy.props.FloatProperty(name="Take precision", description="Quantization of the joint positions of stored takes (meters)", default=0.001, min=0.0001, max=0.01, precision=4)
+    overlayFps : bpy.props.IntProperty(name="Display fps", description="Refresh rate of the stick figures", default=10, min=1, max=60)
+    nodePort : bpy.props.IntProperty(name="Node port", description="While tracking, send the captured joints to fusion hosts connecting on this TCP port (0 : disabled)", default=0, min=0, max=65535)
 
 jointType = {
     "SpineBase":0,
@@ -200,6 +263,766 @@ bonesDefinition = {
 
 restDirection = {}
 
+###############################################
+#                 Synthetic sensor
+###############################################
+
+# extrapolation of a joint with its velocity, capped to avoid overshooting on sudden stops
+def predictionOffset(velocity, lead, maxOffset):
+    offset = [v * lead for v in velocity[0:3]]
+    norm = math.sqrt(sum(o * o for o in offset))
+    if norm > maxOffset:
+        offset = [o * maxOffset / norm for o in offset]
+    return offset
+
+# Python port of SimpleKalman (constant velocity model). The 6x6 model is
+# block diagonal, so each axis is filtered independently with a 2 state
+# (position, velocity) filter, and all axes share the same covariance.
+class SimpleKalman:
+    def __init__(self, dt, sNoise, u, uNoise):
+        self.sensorNoise = sNoise
+        self.u = u
+        self.uNoise = uNoise
+        self.setDt(dt)
+        # initial covariance (Ex) : per axis block of the C++ matrix
+        self.p00, self.p01, self.p11 = self.q00, self.q01, self.q11
+        self.position = [0.0, 0.0, 0.0]
+        self.velocity = [0.0, 0.0, 0.0]
+
+    def setDt(self, dt):
+        # time step of the next predictions, for sources whose frame rate isn't known in advance
+        self.dt = dt
+        self.q00 = dt*dt*dt*dt / 4 * self.uNoise * self.uNoise
+        self.q01 = dt*dt*dt / 2 * self.uNoise * self.uNoise
+        self.q11 = dt*dt * self.uNoise * self.uNoise
+
+    def init(self, x, y, z):
+        self.position = [x, y, z]
+        self.velocity = [0.0, 0.0, 0.0]
+
+    def getFilteredState(self, x, y, z):
+        dt = self.dt
+        # predict
+        acc = self.dt*self.dt / 2 * self.u
+        for i in range(3):
+            self.position[i] += dt * self.velocity[i] + acc
+            self.velocity[i] += acc
+        p00 = self.p00 + dt * 2 * self.p01 + dt*dt * self.p11 + self.q00
+        p01 = self.p01 + dt * self.p11 + self.q01
+        p11 = self.p11 + self.q11
+
+        # update
+        k0 = p00 / (p00 + self.sensorNoise)
+        k1 = p01 / (p00 + self.sensorNoise)
+        for i, measure in enumerate((x, y, z)):
+            innovation = measure - self.position[i]
+            self.position[i] += k0 * innovation
+            self.velocity[i] += k1 * innovation
+        self.p00, self.p01, self.p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+        return tuple(self.position)
+
+    def getPredictedState(self, lead, maxOffset):
+        offset = predictionOffset(self.velocity, lead, maxOffset)
+        return tuple(p + o for p, o in zip(self.position, offset))
+
+# filter one joint, the filter being created on the first frame (like the native sensor)
+def applyKalman(kalman, jointNumber, joint, dt, sNoise, uNoise):
+    if kalman[jointNumber]:
+        if kalman[jointNumber].dt != dt:
+            kalman[jointNumber].setDt(dt)
+        x, y, z = kalman[jointNumber].getFilteredState(joint[0], joint[1], joint[2])
+        return (x, y, z, joint[3])
+    kalman[jointNumber] = SimpleKalman(dt, sNoise, 0, uNoise)
+    kalman[jointNumber].init(joint[0], joint[1], joint[2])
+    return joint
+
+# Kinect joint hierarchy : joint -> (parent, offset from parent, swing channel)
+# offsets and swing channels are only used to generate synthetic motion
+# positions are in Kinect camera space (meters), the actor faces the sensor
+kinectSkeleton = [
+    ("SpineBase", None, (0.0, 0.0, 0.0), None),
+    ("SpineMid", "SpineBase", (0.0, 0.30, 0.0), None),
+    ("SpineShoulder", "SpineMid", (0.0, 0.22, 0.0), None),
+    ("Neck", "SpineShoulder", (0.0, 0.08, 0.0), None),
+    ("Head", "Neck", (0.0, 0.14, 0.0), None),
+    ("ShoulderLeft", "SpineShoulder", (-0.18, -0.04, 0.0), None),
+    ("ElbowLeft", "ShoulderLeft", (0.0, -0.28, 0.0), "armLeft"),
+    ("WristLeft", "ElbowLeft", (0.0, -0.25, 0.0), "forearmLeft"),
+    ("HandLeft", "WristLeft", (0.0, -0.08, 0.0), None),
+    ("HandTipLeft", "HandLeft", (0.0, -0.08, 0.0), None),
+    ("ThumbLeft", "WristLeft", (0.03, -0.06, -0.02), None),
+    ("ShoulderRight", "SpineShoulder", (0.18, -0.04, 0.0), None),
+    ("ElbowRight", "ShoulderRight", (0.0, -0.28, 0.0), "armRight"),
+    ("WristRight", "ElbowRight", (0.0, -0.25, 0.0), "forearmRight"),
+    ("HandRight", "WristRight", (0.0, -0.08, 0.0), None),
+    ("HandTipRight", "HandRight", (0.0, -0.08, 0.0), None),
+    ("ThumbRight", "WristRight", (-0.03, -0.06, -0.02), None),
+    ("HipLeft", "SpineBase", (-0.09, -0.05, 0.0), None),
+    ("KneeLeft", "HipLeft", (0.0, -0.42, 0.0), "legLeft"),
+    ("AnkleLeft", "KneeLeft", (0.0, -0.40, 0.0), "shinLeft"),
+    ("FootLeft", "AnkleLeft", (0.0, -0.05, -0.12), None),
+    ("HipRight", "SpineBase", (0.09, -0.05, 0.0), None),
+    ("KneeRight", "HipRight", (0.0, -0.42, 0.0), "legRight"),
+    ("AnkleRight", "KneeRight", (0.0, -0.40, 0.0), "shinRight"),
+    ("FootRight", "AnkleRight", (0.0, -0.05, -0.12), None)
+]
+
+# Generates plausible walking-in-place skeletons, behind the same interface as the native Sensor
+class SyntheticSensor:
+    def __init__(self, bodies=1, fps=30, noise=0.01, dropout=0.02):
+        self.bodies = bodies
+        self.fps = fps
+        self.noise = noise
+        self.dropout = dropout
+        self.kalman = None
+        self.joints = [(0.0, 0.0, 0.0, 0)] * 25
+        self.rawJoints = self.joints
+        self.predictionLead = 0.0
+        self.predictionMaxOffset = 0.0
+
+    def init(self, dt, sNoise, uNoise):
+        # the filters step at the rate frames are actually produced, not at the capture rate
+        self.dt = 1.0 / self.fps
+        self.sensorNoise = sNoise
+        self.uNoise = uNoise
+        # one set of filters per body, so that the filtering load scales with the body count
+        self.kalman = [[None] * 25 for b in range(self.bodies)]
+        self.startTime = perf_counter()
+        self.lastFrameTime = None
+        self.nextFrameTime = self.startTime
+        return 1
+
+    def close(self):
+        self.kalman = None
+        return 1
+
+    def getJoint(self, jointNumber):
+        joint = self.joints[jointNumber]
+        # prediction on the exposed (last) body
+        kalman = self.kalman[-1][jointNumber] if self.kalman else None
+        if self.predictionLead > 0 and kalman:
+            return kalman.getPredictedState(self.predictionLead, self.predictionMaxOffset) + (joint[3],)
+        return joint
+
+    def getRawJoint(self, jointNumber):
+        return self.rawJoints[jointNumber]
+
+    def setPrediction(self, lead, maxOffset):
+        self.predictionLead = lead
+        self.predictionMaxOffset = maxOffset
+
+    def swing(self, t, body):
+        phase = 2.0 * math.pi * 0.8 * t + body
+        return {
+            "armLeft": -0.5 * math.sin(phase),
+            "forearmLeft": -0.3 - 0.2 * max(0.0, math.sin(phase)),
+            "armRight": 0.5 * math.sin(phase),
+            "forearmRight": -0.3 - 0.2 * max(0.0, -math.sin(phase)),
+            "legLeft": 0.4 * math.sin(phase),
+            "shinLeft": 0.6 * max(0.0, -math.sin(phase)),
+            "legRight": -0.4 * math.sin(phase),
+            "shinRight": 0.6 * max(0.0, math.sin(phase))
+        }
+
+    def generateBody(self, t, body):
+        angles = self.swing(t, body)
+        phase = 2.0 * math.pi * 0.8 * t + body
+        root = (0.8 * body - 0.4 * (self.bodies - 1) + 0.1 * math.sin(0.3 * t + body),
+            0.05 * abs(math.sin(phase)) - 0.1,
+            2.5 + 0.2 * math.sin(0.2 * t + body))
+
+        positions = {}
+        chainAngle = {}
+        for name, parent, offset, channel in kinectSkeleton:
+            if parent is None:
+                positions[name] = root
+                chainAngle[name] = 0.0
+                continue
+            # limbs swing around the lateral (X) axis, accumulated along the chain
+            a = chainAngle[parent] + (angles[channel] if channel else 0.0)
+            chainAngle[name] = a
+            px, py, pz = positions[parent]
+            ox, oy, oz = offset
+            positions[name] = (px + ox,
+                py + oy * math.cos(a) - oz * math.sin(a),
+                pz + oy * math.sin(a) + oz * math.cos(a))
+
+        joints = [None] * 25
+        for name, position in positions.items():
+            state = 2
+            x, y, z = (c + random.gauss(0.0, self.noise) for c in position)
+            if random.random() < self.dropout:
+                state = random.choice((0, 1))
+                if state == 0:
+                    x, y, z = 0.0, 0.0, 0.0
+            joints[jointType[name]] = (x, y, z, state)
+        return joints
+
+    def update(self):
+        if self.kalman is None:
+            return 0
+        now = perf_counter()
+        if now < self.nextFrameTime:
+            return 0
+        self.nextFrameTime += 1.0 / self.fps
+        if self.nextFrameTime < now:
+            # fell behind, don't try to catch up with a burst of frames
+            self.nextFrameTime = now + 1.0 / self.fps
+
+        # frames are only produced when polled, so the motion and the filters follow the real time
+        t = now - self.startTime
+        if self.lastFrameTime is not None:
+            self.dt = now - self.lastFrameTime
+        self.lastFrameTime = now
+        # like the native sensor, the last tracked body is the one exposed
+        for body in range(self.bodies):
+            joints = self.generateBody(t, body)
+            self.rawJoints = joints
+            self.joints = [applyKalman(self.kalman[body], j, joints[j], self.dt, self.sensorNoise, self.uNoise) for j in range(25)]
+        return 1
+
+###############################################
+#                 Joint stream codec
+###############################################
+
+# Binary format for recorded joint streams :
+#   header : magic, version, precision (meters), time scale (stamps per second), chunk size
+#   chunks : compressed size, frame count, zlib(stamps, positions, tracking states)
+#   index  : offset of each chunk, frame count, chunk count, magic
+# Positions are quantized to the precision, stamps are integers, and both are delta
+# encoded from the first frame of their chunk so that each chunk decodes on its own.
+# Tracking states (0 to 2) are packed on 2 bits per joint.
+streamMagic = b"KMCJ"
+indexMagic = b"KMCI"
+streamHeader = struct.Struct("<4sBddI")
+chunkHeader = struct.Struct("<II")
+indexFooter = struct.Struct("<QI4s")
+
+# difference with the previous frame, the first one being kept as is
+def deltaEncode(values):
+    deltas = values.copy()
+    deltas[1:] -= values[:-1]
+    return deltas
+
+def packStates(states):
+    padded = numpy.zeros((len(states), 28), dtype=numpy.uint8)
+    padded[:, :25] = states
+    padded = padded.reshape(-1, 7, 4)
+    return (padded[:, :, 0] | (padded[:, :, 1] << 2) | (padded[:, :, 2] << 4) | (padded[:, :, 3] << 6)).astype(numpy.uint8)
+
+def unpackStates(packed):
+    states = numpy.stack([(packed >> shift) & 3 for shift in (0, 2, 4, 6)], axis=-1)
+    return states.reshape(-1, 28)[:, :25]
+
+# stamps : (n) integers, positions : (n, 25, 3) meters, states : (n, 25) tracking states
+def encodeJointStream(stamps, positions, states, precision=0.001, timeScale=1e6, chunkSize=64):
+    stamps = numpy.asarray(stamps, dtype=numpy.int64)
+    quantized = numpy.round(numpy.asarray(positions, dtype=numpy.float64) / precision).astype(numpy.int32)
+    states = numpy.asarray(states, dtype=numpy.uint8)
+
+    data = [streamHeader.pack(streamMagic, 1, precision, timeScale, chunkSize)]
+    offset = streamHeader.size
+    offsets = []
+    for start in range(0, len(stamps), chunkSize):
+        chunk = slice(start, start + chunkSize)
+        payload = zlib.compress(deltaEncode(stamps[chunk]).tobytes()
+            + deltaEncode(quantized[chunk]).tobytes()
+            + packStates(states[chunk]).tobytes())
+        offsets.append(offset)
+        data += [chunkHeader.pack(len(payload), len(stamps[chunk])), payload]
+        offset += chunkHeader.size + len(payload)
+    data += [numpy.array(offsets, dtype=numpy.uint64).tobytes(), indexFooter.pack(len(stamps), len(offsets), indexMagic)]
+    return b"".join(data)
+
+def isJointStream(data):
+    return data[:len(streamMagic)] == streamMagic
+
+# Random access to an encoded joint stream, decoding to NumPy arrays
+class JointStreamReader:
+    def __init__(self, data):
+        self.data = data
+        magic, version, self.precision, self.timeScale, self.chunkSize = streamHeader.unpack_from(data, 0)
+        if magic != streamMagic or version != 1:
+            raise ValueError("not a joint stream")
+        self.frameCount, chunkCount, magic = indexFooter.unpack_from(data, len(data) - indexFooter.size)
+        if magic != indexMagic:
+            raise ValueError("truncated joint stream")
+        self.offsets = numpy.frombuffer(data, dtype=numpy.uint64, count=chunkCount,
+            offset=len(data) - indexFooter.size - 8 * chunkCount)
+
+    def readChunk(self, index):
+        size, count = chunkHeader.unpack_from(self.data, int(self.offsets[index]))
+        start = int(self.offsets[index]) + chunkHeader.size
+        payload = zlib.decompress(self.data[start : start + size])
+        stamps = numpy.cumsum(numpy.frombuffer(payload, dtype=numpy.int64, count=count))
+        deltas = numpy.frombuffer(payload, dtype=numpy.int32, count=count * 75, offset=8 * count)
+        positions = numpy.cumsum(deltas.reshape(count, 25, 3), axis=0) * self.precision
+        packed = numpy.frombuffer(payload, dtype=numpy.uint8, count=count * 7, offset=8 * count + 300 * count)
+        return stamps, positions, unpackStates(packed.reshape(count, 7))
+
+    # frames from start to stop (excluded), only the chunks covering them are decoded
+    def read(self, start=0, stop=None):
+        stop = self.frameCount if stop is None else min(stop, self.frameCount)
+        if start >= stop:
+            return numpy.zeros(0, dtype=numpy.int64), numpy.zeros((0, 25, 3)), numpy.zeros((0, 25), dtype=numpy.uint8)
+        first, last = start // self.chunkSize, (stop - 1) // self.chunkSize
+        chunks = [self.readChunk(i) for i in range(first, last + 1)]
+        skip = start - first * self.chunkSize
+        return tuple(numpy.concatenate([chunk[k] for chunk in chunks])[skip : skip + stop - start] for k in range(3))
+
+    # (timestamp in seconds, joints) for each frame, chunk by chunk
+    def frames(self):
+        for index in range(len(self.offsets)):
+            stamps, positions, states = self.readChunk(index)
+            for stamp, position, state in zip(stamps, positions.tolist(), states.tolist()):
+                yield (stamp / self.timeScale, [(p[0], p[1], p[2], st) for p, st in zip(position, state)])
+
+###############################################
+#                 Multi-source fusion
+###############################################
+
+# Joint streams (recorded files or capture nodes over TCP) are text, one frame per line :
+# timestamp (seconds) followed by x y z trackingState for each of the 25 joints
+def formatFrameLine(timestamp, joints):
+    return " ".join(["%.6f" % timestamp] + ["%.5f %.5f %.5f %d" % tuple(j) for j in joints]) + "\n"
+
+def parseFrameLine(line):
+    values = line.split()
+    if len(values) != 1 + 25 * 4:
+        return None
+    joints = []
+    for j in range(25):
+        x, y, z, state = values[1 + 4*j : 5 + 4*j]
+        joints.append((float(x), float(y), float(z), int(state)))
+    return (float(values[0]), joints)
+
+# capture nodes are given as host:port, anything else is a file
+def isNodeAddress(address):
+    host, sep, port = address.rpartition(":")
+    return sep != "" and port.isdigit() and "/" not in host and "\\" not in host
+
+# fusion weight of a joint, depending on its tracking state
+trackingWeight = (0.0, 0.2, 1.0)
+
+# Maps the source timestamps on the local clock, the earliest first frame of the sources being "now".
+# Sources are expected to share a time base, the per-source time offset only corrects it.
+class SharedClock:
+    # how long a source waits for the first frame of the others
+    startDelay = 1.0
+
+    def __init__(self, sources):
+        self.sources = sources
+        self.firstTimestamps = []
+        self.offset = None
+        self.condition = threading.Condition()
+
+    def start(self, timestamp):
+        with self.condition:
+            self.firstTimestamps.append(timestamp)
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: len(self.firstTimestamps) >= self.sources, timeout=self.startDelay)
+            if self.offset is None:
+                self.offset = perf_counter() - min(self.firstTimestamps)
+
+    def toLocal(self, timestamp):
+        return timestamp + self.offset
+
+# Decodes, calibrates and filters one joint stream on its own thread
+class SourceReader(threading.Thread):
+    def __init__(self, address, clock, calibration, timeOffset, dt, sNoise, uNoise):
+        threading.Thread.__init__(self, daemon=True)
+        self.address = address
+        self.clock = clock
+        self.calibration = calibration
+        self.timeOffset = timeOffset
+        self.dt = dt
+        self.sensorNoise = sNoise
+        self.uNoise = uNoise
+        self.kalman = [None] * 25
+        self.frames = deque(maxlen=64) # (local time, raw joints, filtered joints, velocities)
+        self.lock = threading.Lock()
+        self.running = True
+        self.error = None
+
+    def stream(self):
+        if isNodeAddress(self.address):
+            lines = self.nodeLines()
+        else:
+            with open(self.address, "rb") as f:
+                data = f.read()
+            if isJointStream(data):
+                yield from JointStreamReader(data).frames()
+                return
+            lines = data.decode("ascii", "replace").splitlines()
+        for line in lines:
+            frame = parseFrameLine(line)
+            if frame is not None:
+                yield frame
+
+    def nodeLines(self):
+        host, port = self.address.rsplit(":", 1)
+        with socket.create_connection((host, int(port)), timeout=2.0) as conn:
+            conn.settimeout(None)
+            buffer = b""
+            while self.running:
+                # wait for data without timing the socket out, so that a silent node isn't dropped
+                ready, _, _ = select.select([conn], [], [], 1.0)
+                if not ready:
+                    continue
+                data = conn.recv(65536)
+                if not data:
+                    return
+                lines = (buffer + data).split(b"\n")
+                buffer = lines.pop()
+                for line in lines:
+                    yield line.decode("ascii", "replace")
+
+    def run(self):
+        previous = None
+        try:
+            for timestamp, joints in self.stream():
+                if not self.running:
+                    break
+                if previous is None:
+                    self.clock.start(timestamp)
+                elif timestamp > previous:
+                    # the filters step at the rate of the stream
+                    self.dt = timestamp - previous
+                previous = timestamp
+                sourceTime = self.clock.toLocal(timestamp)
+                localTime = sourceTime + self.timeOffset
+
+                # recorded files are played back in real time
+                delay = sourceTime - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+
+                calibrated = []
+                for j, joint in enumerate(joints):
+                    if joint[3] != 0:
+                        position = self.calibration @ Vector(joint[0:3])
+                        joint = (position.x, position.y, position.z, joint[3])
+                    calibrated.append(joint)
+                filtered = []
+                velocities = []
+                for j, joint in enumerate(calibrated):
+                    kalman = self.kalman[j]
+                    if joint[3] == 0:
+                        # lost joint : the filter is held until the joint is tracked again
+                        filtered.append(tuple(kalman.position) + (0,) if kalman else joint)
+                    else:
+                        filtered.append(applyKalman(self.kalman, j, joint, self.dt, self.sensorNoise, self.uNoise))
+                        kalman = self.kalman[j]
+                    velocities.append(tuple(kalman.velocity) + (joint[3],) if kalman else (0.0, 0.0, 0.0, 0))
+
+                with self.lock:
+                    self.frames.append((localTime, calibrated, filtered, velocities))
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+        self.running = False
+
+    def sample(self, time, stage):
+        # joints (stage 1 : raw, 2 : filtered, 3 : velocities) at the requested time, linearly interpolated between the surrounding frames
+        with self.lock:
+            frames = list(self.frames)
+        if not frames or frames[0][0] > time:
+            return None
+        before = frames[0]
+        for frame in frames:
+            if frame[0] > time:
+                span = frame[0] - before[0]
+                k = (time - before[0]) / span if span > 0 else 1.0
+                return [(a[0] + (b[0] - a[0]) * k, a[1] + (b[1] - a[1]) * k, a[2] + (b[2] - a[2]) * k, min(a[3], b[3]))
+                    for a, b in zip(before[stage], frame[stage])]
+            before = frame
+        return before[stage]
+
+    def latest(self):
+        with self.lock:
+            return self.frames[-1][0] if self.frames else None
+
+# Time-aligns and merges several joint streams, behind the same interface as the native Sensor
+class FusionSensor:
+    # sources not updated for that long are left out of the fusion
+    staleDelay = 0.5
+
+    def __init__(self, sources):
+        self.sources = sources # (address, calibration matrix, time offset)
+        self.readers = []
+        self.joints = [(0.0, 0.0, 0.0, 0)] * 25
+        self.rawJoints = self.joints
+        self.velocities = self.joints
+        self.lastTime = None
+        self.predictionLead = 0.0
+        self.predictionMaxOffset = 0.0
+
+    def init(self, dt, sNoise, uNoise):
+        clock = SharedClock(len(self.sources))
+        self.readers = [SourceReader(address, clock, calibration, timeOffset, dt, sNoise, uNoise)
+            for address, calibration, timeOffset in self.sources]
+        for reader in self.readers:
+            reader.start()
+        self.lastTime = None
+        return 1 if self.readers else 0
+
+    def close(self):
+        for reader in self.readers:
+            reader.running = False
+        self.readers = []
+        return 1
+
+    def getJoint(self, jointNumber):
+        joint = self.joints[jointNumber]
+        if self.predictionLead > 0:
+            offset = predictionOffset(self.velocities[jointNumber], self.predictionLead, self.predictionMaxOffset)
+            return (joint[0] + offset[0], joint[1] + offset[1], joint[2] + offset[2], joint[3])
+        return joint
+
+    def getRawJoint(self, jointNumber):
+        return self.rawJoints[jointNumber]
+
+    def setPrediction(self, lead, maxOffset):
+        self.predictionLead = lead
+        self.predictionMaxOffset = maxOffset
+
+    def fuse(self, samples):
+        fused = []
+        for j in range(25):
+            weight, state = 0.0, 0
+            x = y = z = 0.0
+            for joints in samples:
+                w = trackingWeight[joints[j][3]]
+                x += joints[j][0] * w
+                y += joints[j][1] * w
+                z += joints[j][2] * w
+                weight += w
+                state = max(state, joints[j][3])
+            if weight > 0:
+                fused.append((x / weight, y / weight, z / weight, state))
+            else:
+                fused.append((0.0, 0.0, 0.0, 0))
+        return fused
+
+    def update(self):
+        now = perf_counter()
+        live = []
+        for reader in self.readers:
+            latest = reader.latest()
+            # the time offset only aligns the sources, staleness is judged on the time of arrival
+            if latest is not None and latest - reader.timeOffset > now - self.staleDelay:
+                live.append((latest, reader))
+        if not live:
+            return 0
+        # most recent time for which every live source has data
+        time = min(latest for latest, reader in live)
+        if self.lastTime is not None and time <= self.lastTime:
+            return 0
+        self.lastTime = time
+
+        for stage in (1, 2, 3):
+            samples = [reader.sample(time, stage) for latest, reader in live]
+            fused = self.fuse([joints for joints in samples if joints is not None])
+            if stage == 1:
+                self.rawJoints = fused
+            elif stage == 2:
+                self.joints = fused
+            else:
+                self.velocities = fused
+        return 1
+
+# Capture node : the raw joints of each captured frame are sent to the connected fusion hosts,
+# timestamped with the wall clock (the clocks of the capture PCs are expected to be synchronized)
+nodeState = {"server": None, "clients": []}
+
+def startNode(port):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        server.bind(("", port))
+        server.listen()
+    except OSError:
+        server.close()
+        raise
+    server.setblocking(False)
+    nodeState["server"] = server
+
+def stopNode():
+    for conn in nodeState["clients"]:
+        conn.close()
+    if nodeState["server"] is not None:
+        nodeState["server"].close()
+    nodeState.update(server=None, clients=[])
+
+def serveFrame(sensor):
+    server = nodeState["server"]
+    if server is None:
+        return
+    # accept the hosts connected since the last frame
+    while True:
+        try:
+            conn, address = server.accept()
+        except BlockingIOError:
+            break
+        conn.setblocking(False)
+        nodeState["clients"].append(conn)
+
+    line = formatFrameLine(wallTime(), [sensor.getRawJoint(j) for j in range(25)]).encode("ascii")
+    for conn in list(nodeState["clients"]):
+        # the capture loop doesn't wait for slow hosts, they are dropped rather than sent partial lines
+        try:
+            sent = conn.send(line)
+        except OSError:
+            sent = 0
+        if sent < len(line):
+            conn.close()
+            nodeState["clients"].remove(conn)
+
+# statistics of the capture loop, displayed while tracking
+captureStats = {"ticks": 0, "frames": 0, "lastTickTime": 0.0, "maxTickTime": 0.0, "nextTick": None, "lastFrame": None, "frameInterval": 0.0, "loopLatency": 0.0,
+    "shedLevel": 0, "shedPoseWrites": 0, "shedKeys": 0, "shedExtremities": 0}
+
+# Load shedding, when a tick exceeds its budget the next ones drop work in this order :
+# 1 : pose writes (the viewport isn't updated, keys are made from the solved values)
+# 2 : key insertion (keys are queued and inserted when back under budget)
+# 3 : extremity bones (solved every other frame)
+# The raw stream of the take is always recorded, so no captured frame is lost.
+extremityBones = {"Head", "LeftHand", "RightHand", "LeftFoot", "RightFoot"}
+# keys inserted per tick while catching up with the queue
+flushBatch = 200
+
+# smoothing of the measured latencies
+latencySmoothing = 0.1
+
+def predictionLead(context):
+    props = context.scene.kmc_props
+    if props.prediction == "Manual":
+        return props.predictionLatency
+    if props.prediction == "Auto":
+        return props.predictionLatency + captureStats["loopLatency"]
+    return 0.0
+
+###############################################
+#                 Light display
+###############################################
+
+# state of the light display : draw handler, batches and suspended modifiers (object name, modifier name)
+# the generation is increased on each start / stop, so that refresh timers of a previous session stop
+overlayState = {"handler": None, "kinectBatch": None, "boneBatch": None, "suspended": [], "armature": None, "generation": 0}
+
+def kinectToBlender(joint):
+    return Vector((-joint[0], joint[2], joint[1]))
+
+def drawOverlay():
+    shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
+    shader.bind()
+    if overlayState["kinectBatch"] is not None:
+        shader.uniform_float("color", (0.2, 0.8, 1.0, 1.0))
+        overlayState["kinectBatch"].draw(shader)
+    if overlayState["boneBatch"] is not None:
+        shader.uniform_float("color", (1.0, 0.6, 0.1, 1.0))
+        overlayState["boneBatch"].draw(shader)
+
+# timer function, writes the pose deferred by the capture ticks and rebuilds the stick figures at the display rate
+def refreshOverlay(context, generation):
+    props = context.scene.kmc_props
+    if not props.isTracking or overlayState["handler"] is None or generation != overlayState["generation"]:
+        return None
+
+    shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
+    arma = bpy.data.objects[props.arma_list]
+    # last solved pose, composed as the armature isn't evaluated yet once written
+    poseBuffer = PoseBuffer(context)
+
+    # solved bone chain
+    coords = []
+    for target in props.targetBones:
+        if target.value is not None and target.value != "" :
+            bone = arma.pose.bones[target.value]
+            mat = arma.matrix_world @ poseBuffer.getMatrix(bone)
+            coords += [mat.to_translation(), mat @ Vector((0, bone.bone.length, 0))]
+    overlayState["boneBatch"] = batch_for_shader(shader, 'LINES', {"pos": coords})
+
+    # tracked Kinect skeleton, anchored on the root bone
+    sensor = context.scene.k_sensor
+    coords = []
+    rootTarget = [t.value for t in props.targetBones if t.name == props.rootBone and t.value]
+    if rootTarget:
+        joints = [sensor.getJoint(j) for j in range(25)]
+        origin = (arma.matrix_world @ poseBuffer.getMatrix(arma.pose.bones[rootTarget[0]])).to_translation()
+        origin = origin - kinectToBlender(joints[jointType[bonesDefinition[props.rootBone][0]]])
+        for name, parent, offset, channel in kinectSkeleton:
+            if parent is not None and joints[jointType[name]][3] != 0 and joints[jointType[parent]][3] != 0:
+                coords += [origin + kinectToBlender(joints[jointType[parent]]), origin + kinectToBlender(joints[jointType[name]])]
+    overlayState["kinectBatch"] = batch_for_shader(shader, 'LINES', {"pos": coords})
+
+    if poseBuffer.composed:
+        poseBuffer.write()
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+    return 1.0 / props.overlayFps
+
+# suspend deformation of the meshes bound to the armature
+def suspendDeformation():
+    arma = bpy.data.objects.get(overlayState["armature"] or "")
+    overlayState["suspended"] = []
+    if arma is None:
+        return
+    for obj in bpy.data.objects:
+        for mod in obj.modifiers:
+            if mod.type == 'ARMATURE' and mod.object == arma and mod.show_viewport:
+                mod.show_viewport = False
+                overlayState["suspended"].append((obj.name, mod.name))
+
+def restoreDeformation():
+    for objName, modName in overlayState["suspended"]:
+        obj = bpy.data.objects.get(objName)
+        if obj is not None and modName in obj.modifiers:
+            obj.modifiers[modName].show_viewport = True
+    overlayState["suspended"] = []
+
+# the suspended modifiers must not be saved in the .blend file
+@bpy.app.handlers.persistent
+def restoreDeformationOnSave(dummy):
+    restoreDeformation()
+
+@bpy.app.handlers.persistent
+def suspendDeformationAfterSave(dummy):
+    if overlayState["handler"] is not None:
+        suspendDeformation()
+
+def startLightDisplay(context):
+    overlayState["armature"] = context.scene.kmc_props.arma_list
+    overlayState["generation"] += 1
+    suspendDeformation()
+    overlayState["handler"] = bpy.types.SpaceView3D.draw_handler_add(drawOverlay, (), 'WINDOW', 'POST_VIEW')
+    bpy.app.timers.register(functools.partial(refreshOverlay, context, overlayState["generation"]))
+
+def stopLightDisplay():
+    if overlayState["handler"] is not None:
+        bpy.types.SpaceView3D.draw_handler_remove(overlayState["handler"], 'WINDOW')
+    restoreDeformation()
+    overlayState["generation"] += 1
+    overlayState.update(handler=None, kinectBatch=None, boneBatch=None, armature=None)
+
+def createSensor(context):
+    props = context.scene.kmc_props
+    if props.backend == "Synthetic":
+        return SyntheticSensor(props.synthBodies, props.synthFps, props.synthNoise, props.synthDropout)
+    if props.backend == "Fusion":
+        sources = []
+        for source in props.sources:
+            if source.enabled and source.address != "":
+                address = source.address if isNodeAddress(source.address) else bpy.path.abspath(source.address)
+                calibration = Matrix.Translation(source.location) @ Euler(source.rotation).to_matrix().to_4x4()
+                sources.append((address, calibration, source.timeOffset))
+        return FusionSensor(sources)
+    try:
+        return loadNativeModule().Sensor()
+    except ImportError:
+        return None
+
 def initialize(context):
     # reset pose
     bpy.ops.pose.select_all(action=('SELECT'))
@@ -226,63 +1049,441 @@ def initialize(context):
                 restDirection[target.name] = baseDir.rotation_difference(Vector((0,1,0)))
 
 
-def updatePose(context, bone):
+# Flat pose channels of the target armature. Solved values are written here
+# during the bone walk, then pushed to Blender in bulk with a single
+# foreach_set per channel, instead of one RNA update per bone property.
+class PoseBuffer:
+    def __init__(self, context):
+        self.arma = bpy.data.objects[context.scene.kmc_props.arma_list]
+        bones = self.arma.pose.bones
+        self.index = {}
+        for i, bone in enumerate(bones):
+            self.index[bone.name] = i
+        self.rotations = [0.0] * (4 * len(bones))
+        self.locations = [0.0] * (3 * len(bones))
+        # while pose writes are shed, start from the last solved pose and compose the bone matrices,
+        # the armature still holds an outdated pose
+        self.composed = shedPose.get("armature") == self.arma.name
+        if self.composed:
+            self.rotations[:] = shedPose["rotations"]
+            self.locations[:] = shedPose["locations"]
+        else:
+            bones.foreach_get("rotation_quaternion", self.rotations)
+            bones.foreach_get("location", self.locations)
+        # composed pose matrices (bone name -> matrix)
+        self.matrices = {}
+        # bones to keyframe once the pose has been applied (bone, with location)
+        self.keyed = []
+
+    def getRotation(self, bone):
+        i = 4 * self.index[bone.name]
+        return Quaternion(self.rotations[i:i+4])
+
+    def setRotation(self, bone, rot):
+        i = 4 * self.index[bone.name]
+        self.rotations[i:i+4] = rot
+        self.invalidate(bone)
+
+    # pose space matrix of the bone, composed from the buffer (parent first) if the pose isn't written
+    def getMatrix(self, bone):
+        if not self.composed:
+            return bone.matrix
+        if bone.name not in self.matrices:
+            i = self.index[bone.name]
+            self.matrices[bone.name] = (self.getBase(bone) @ Matrix.Translation(self.locations[3*i:3*i+3])
+                @ Quaternion(self.rotations[4*i:4*i+4]).to_matrix().to_4x4())
+        return self.matrices[bone.name]
+
+    # pose space matrix of the bone before its own location and rotation
+    def getBase(self, bone):
+        if bone.parent is None:
+            return bone.bone.matrix_local
+        return self.getMatrix(bone.parent) @ bone.parent.bone.matrix_local.inverted() @ bone.bone.matrix_local
+
+    def invalidate(self, bone):
+        if self.matrices.pop(bone.name, None) is not None:
+            for child in bone.children:
+                self.invalidate(child)
+
+    def setPoseTranslation(self, bone, translation):
+        # convert the pose space position into the bone local location
+        if self.composed:
+            location = self.getBase(bone).inverted() @ translation
+        else:
+            mat = bone.matrix.copy()
+            mat.translation = translation
+            location = self.arma.convert_space(pose_bone=bone, matrix=mat, from_space='POSE', to_space='LOCAL').to_translation()
+        i = 3 * self.index[bone.name]
+        self.locations[i:i+3] = location
+        self.invalidate(bone)
+
+    def write(self):
+        bones = self.arma.pose.bones
+        bones.foreach_set("rotation_quaternion", self.rotations)
+        bones.foreach_set("location", self.locations)
+        self.arma.update_tag(refresh={'DATA'})
+        shedPose.clear()
+
+    # keys are taken from keyBuffer if given (e.g. the solve without prediction)
+    # a deferred pose is kept as when shed, and written later (e.g. by the light display)
+    def apply(self, context, shedLevel=0, keyBuffer=None, deferWrite=False):
+        written = shedLevel < 1 and not deferWrite
+        if written:
+            self.write()
+        else:
+            shedPose.update(armature=self.arma.name, rotations=self.rotations, locations=self.locations)
+
+        if not context.scene.tool_settings.use_keyframe_insert_auto:
+            return
+        if written and keyBuffer is None:
+            for bone, withLocation in self.keyed:
+                bone.keyframe_insert(data_path="rotation_quaternion")
+                if withLocation:
+                    bone.keyframe_insert(data_path="location")
+        else:
+            # the written pose isn't the keyed one (or isn't written), keys are made from the solved values
+            (keyBuffer or self).queueKeys(context.scene.frame_current)
+            if shedLevel < 2:
+                flushKeys(self.arma)
+
+    def queueKeys(self, frame):
+        for bone, withLocation in self.keyed:
+            i = self.index[bone.name]
+            pendingKeys.append((frame, bone.name, "rotation_quaternion", self.rotations[4*i:4*i+4]))
+            if withLocation:
+                pendingKeys.append((frame, bone.name, "location", self.locations[3*i:3*i+3]))
+
+# last solved pose while pose writes are shed : armature, rotations, locations
+shedPose = {}
+
+# keys waiting to be inserted : (frame, bone name, channel, values)
+pendingKeys = deque()
+
+def flushKeys(arma, limit=None):
+    action = armatureAction(arma)
+    fcurves = set()
+    count = 0
+    while pendingKeys and (limit is None or count < limit):
+        frame, boneName, channel, values = pendingKeys.popleft()
+        for index, value in enumerate(values):
+            fcurve = poseCurve(action, boneName, channel, index)
+            fcurve.keyframe_points.insert(frame, value, options={'FAST'})
+            fcurves.add(fcurve)
+        count += 1
+    for fcurve in fcurves:
+        fcurve.update()
+
+
+def updatePose(context, bone, poseBuffer, targets, skipped=()):
     sensor = context.scene.k_sensor
     
-    for target in context.scene.kmc_props.targetBones:
-        if target.value is not None and target.value == bone.name:
-            # update bone pose
-            head = sensor.getJoint(jointType[bonesDefinition[target.name][0]])
-            tail = sensor.getJoint(jointType[bonesDefinition[target.name][1]])
+    if bone.name in targets and targets[bone.name] not in skipped:
+        targetName = targets[bone.name]
+        # update bone pose
+        head = sensor.getJoint(jointType[bonesDefinition[targetName][0]])
+        tail = sensor.getJoint(jointType[bonesDefinition[targetName][1]])
+        
+        # axes matching
+        X = 0 # inverted
+        Y = 2
+        Z = 1
+        
+        # update only tracked bones
+        if(head[3] == 2) and (tail[3] == 2) :
+            boneV = Vector((head[X] - tail[X], tail[Y] - head[Y], tail[Z] - head[Z]))
+            isRoot = targetName == context.scene.kmc_props.rootBone
             
-            # axes matching
-            X = 0 # inverted
-            Y = 2
-            Z = 1
+            # if first bone, update position (only for configured axes)
+            if isRoot:
+                # initialize firstFramePosition if fit isn't
+                if context.scene.kmc_props.firstFramePosition[1] == -1:
+                    context.scene.kmc_props.firstFramePosition = (-1.0*head[X], head[Y], head[Z])
+                    
+                ffp = context.scene.kmc_props.firstFramePosition
+                tx = context.scene.kmc_props.initialOffset[0]
+                ty = context.scene.kmc_props.initialOffset[2]
+                tz = context.scene.kmc_props.initialOffset[1]
+                if not context.scene.kmc_props.lockwidth:
+                    tx += -head[X] - ffp[0]
+                if not context.scene.kmc_props.lockHeight:
+                    ty += head[Z] - ffp[2]
+                if not context.scene.kmc_props.lockDepth:
+                    tz += head[Y] - ffp[1]
+                    
+                # translate bone
+                poseBuffer.setPoseTranslation(bone, Vector((tx, tz, ty)))
+            
+            # convert rotation in local coordinates
+            boneV = boneV @ poseBuffer.getMatrix(bone)
+            
+            # compensate rest pose direction
+            if targetName in restDirection :
+                boneV.rotate(restDirection[targetName])
+            
+            # calculate desired rotation
+            rot = Vector((0,1,0)).rotation_difference(boneV)
+            poseBuffer.setRotation(bone, poseBuffer.getRotation(bone) @ rot)
+            poseBuffer.keyed.append((bone, isRoot))
             
-            # update only tracked bones
-            if(head[3] == 2) and (tail[3] == 2) :
-                boneV = Vector((head[X] - tail[X], tail[Y] - head[Y], tail[Z] - head[Z]))
-                
-                # if first bone, update position (only for configured axes)
-                if target.name == context.scene.kmc_props.rootBone:
-                    # initialize firstFramePosition if fit isn't
-                    if context.scene.kmc_props.firstFramePosition[1] == -1:
-                        context.scene.kmc_props.firstFramePosition = (-1.0*head[X], head[Y], head[Z])
-                        
-                    ffp = context.scene.kmc_props.firstFramePosition
-                    tx = context.scene.kmc_props.initialOffset[0]
-                    ty = context.scene.kmc_props.initialOffset[2]
-                    tz = context.scene.kmc_props.initialOffset[1]
-                    if not context.scene.kmc_props.lockwidth:
-                        tx += -head[X] - ffp[0]
-                    if not context.scene.kmc_props.lockHeight:
-                        ty += head[Z] - ffp[2]
-                    if not context.scene.kmc_props.lockDepth:
-                        tz += head[Y] - ffp[1]
-                        
-                    # translate bone
-                    bone.matrix.translation = (tx, tz, ty)
-                
-                # convert rotation in local coordinates
-                boneV = boneV @ bone.matrix
-                
-                # compensate rest pose direction
-                if target.name in restDirection :
-                    boneV.rotate(restDirection[target.name])
-                
-                # calculate desired rotation
-                rot = Vector((0,1,0)).rotation_difference(boneV)
-                bone.rotation_quaternion = bone.rotation_quaternion @ rot
-                
-                if context.scene.tool_settings.use_keyframe_insert_auto:
-                    bone.keyframe_insert(data_path="rotation_quaternion")
-                    if target.name == context.scene.kmc_props.rootBone:
-                        bone.keyframe_insert(data_path="location")
-                
     # update child bones
     for child in bone.children :
-        updatePose(context, child)
+        updatePose(context, child, poseBuffer, targets, skipped)
+
+###############################################
+#                    Takes
+###############################################
+
+# Raw joint stream of a take, with the cached intermediate results of its solve
+class Take:
+    def __init__(self, frameRate, armature):
+        self.frameRate = frameRate  # scene frames per second, time scale of the stamps
+        self.armature = armature
+        self.dt = 1.0 / frameRate   # step of the filters, the measured interval between samples once recorded
+        self.frames = []        # scene frame of each sample
+        self.times = []         # capture time of each sample, while recording
+        self.raw = []           # raw joints of each sample
+        self.filtered = {}      # denoising strength -> filtered joints of each sample
+        self.rotations = {}     # bone name -> (solve key, rotation of each sample, None if not tracked)
+        self.locations = None   # (solve key, bone name, location of each sample, None if not tracked)
+
+    def record(self, frame, joints, time):
+        self.frames.append(frame)
+        self.times.append(time)
+        self.raw.append(joints)
+
+    # samples are recorded at the rate of the source, the median interval ignores pauses of the recording
+    def measureInterval(self):
+        if len(self.times) > 1:
+            self.dt = float(numpy.median(numpy.diff(self.times)))
+        self.times = []
+
+    # raw stream in the joint stream format, stamps being scene frames (so that it plays back at the scene rate)
+    def encode(self, precision):
+        raw = numpy.array(self.raw, dtype=numpy.float64).reshape(-1, 25, 4)
+        return encodeJointStream(self.frames, raw[:, :, :3], raw[:, :, 3], precision, self.frameRate)
+
+    @staticmethod
+    def decode(data, armature, dt=None):
+        reader = JointStreamReader(data)
+        stamps, positions, states = reader.read()
+        take = Take(reader.timeScale, armature)
+        if dt is not None:
+            take.dt = dt
+        take.frames = stamps.tolist()
+        take.raw = [[(p[0], p[1], p[2], st) for p, st in zip(position, state)]
+            for position, state in zip(positions.tolist(), states.tolist())]
+        return take
+
+# last complete take, and the one being recorded
+takes = {"last": None, "recording": None}
+
+def startTake(context):
+    render = context.scene.render
+    takes["recording"] = Take(render.fps / render.fps_base, context.scene.kmc_props.arma_list)
+
+# takes belong to the file they were recorded in
+@bpy.app.handlers.persistent
+def clearTakes(dummy):
+    takes["last"] = None
+    takes["recording"] = None
+
+def stopTake(context):
+    take = takes["recording"]
+    takes["recording"] = None
+    if take is not None and take.frames:
+        take.measureInterval()
+        takes["last"] = take
+        # embed the take in the .blend file
+        data = take.encode(context.scene.kmc_props.recordPrecision)
+        context.scene["kmc_take"] = {"armature": take.armature, "dt": take.dt, "data": base64.b64encode(data).decode("ascii")}
+
+# last take, loaded from the .blend file if needed
+def lastTake(context):
+    if takes["last"] is None and "kmc_take" in context.scene:
+        embedded = context.scene["kmc_take"]
+        takes["last"] = Take.decode(base64.b64decode(embedded["data"]), embedded["armature"], embedded.get("dt"))
+    return takes["last"]
+
+def filterStream(raw, dt, uNoise):
+    kalman = [None] * 25
+    return [[applyKalman(kalman, j, joint, dt, kalmanSensorNoise, uNoise) for j, joint in enumerate(joints)] for joints in raw]
+
+# bone vector in Blender axes, None if one of its joints isn't tracked
+def boneDirection(joints, targetName):
+    head = joints[jointType[bonesDefinition[targetName][0]]]
+    tail = joints[jointType[bonesDefinition[targetName][1]]]
+    if head[3] != 2 or tail[3] != 2:
+        return None
+    return Vector((head[0] - tail[0], tail[2] - head[2], tail[1] - head[1]))
+
+def armatureAction(arma):
+    if arma.animation_data is None:
+        arma.animation_data_create()
+    if arma.animation_data.action is None:
+        arma.animation_data.action = bpy.data.actions.new(arma.name + "Action")
+    return arma.animation_data.action
+
+# fcurve of a bone channel, created if needed
+def poseCurve(action, boneName, channel, index, create=True):
+    dataPath = 'pose.bones["%s"].%s' % (boneName.replace('"', '\\"'), channel)
+    fcurve = action.fcurves.find(dataPath, index=index)
+    if fcurve is None and create:
+        fcurve = action.fcurves.new(dataPath, index=index, action_group=boneName)
+    return fcurve
+
+# replace the keys of a bone channel over the frame range of the take
+def writeTakeCurves(action, take, boneName, channel, values):
+    perFrame = {}
+    for frame, value in zip(take.frames, values):
+        if value is not None:
+            # last sample of a frame wins, like keyframe_insert during capture
+            perFrame[frame] = value
+    first, last = min(take.frames), max(take.frames)
+
+    for index in range(4 if channel == "rotation_quaternion" else 3):
+        fcurve = poseCurve(action, boneName, channel, index, create=bool(perFrame))
+        if fcurve is None:
+            continue
+        points = [tuple(k.co) for k in fcurve.keyframe_points if not first <= k.co[0] <= last]
+        points = sorted(points + [(frame, value[index]) for frame, value in perFrame.items()])
+        while len(fcurve.keyframe_points) > 0:
+            fcurve.keyframe_points.remove(fcurve.keyframe_points[-1], fast=True)
+        fcurve.keyframe_points.add(len(points))
+        fcurve.keyframe_points.foreach_set("co", [c for point in points for c in point])
+        fcurve.update()
+
+# Solves the take with the current settings. Only the stages depending on a changed
+# setting are recomputed : filtering per denoising strength, then rotations per bone
+# (a bone depends on its mapping and on its parents), and only their curves are rewritten.
+def solveTake(context, take):
+    props = context.scene.kmc_props
+    arma = bpy.data.objects[take.armature]
+    strength = props.kalmanStrength
+    if strength not in take.filtered:
+        take.filtered[strength] = filterStream(take.raw, take.dt, kalmanNoise[strength])
+    stream = take.filtered[strength]
+
+    targets = {}
+    rootTarget = None
+    for target in props.targetBones:
+        # mapped bones missing from the armature of the take are ignored
+        if target.value is not None and target.value != "" and target.value in arma.pose.bones:
+            targets[target.value] = target.name
+            if target.name == props.rootBone:
+                rootTarget = target.value
+    roots = [bone for bone in arma.pose.bones if bone.parent is None]
+
+    # solve keys, invalidated by a change of the bone mapping or of a parent's
+    keys = {}
+    def computeKeys(bone, parentKey):
+        keys[bone.name] = (strength, targets.get(bone.name), parentKey)
+        for child in bone.children:
+            computeKeys(child, keys[bone.name])
+    for root in roots:
+        computeKeys(root, None)
+
+    dirty = set(name for name in targets if name not in take.rotations or take.rotations[name][0] != keys[name])
+    locationKey = None
+    if rootTarget is not None:
+        parent = arma.pose.bones[rootTarget].parent
+        locationKey = (strength, props.rootBone, rootTarget, props.lockwidth, props.lockHeight, props.lockDepth,
+            keys[parent.name] if parent else None)
+    locationDirty = locationKey is not None and (take.locations is None or take.locations[0] != locationKey)
+
+    # parents pose matrices are only needed above bones to recompute
+    def needsPose(bone):
+        return any(child.name in dirty or (locationDirty and child.name == rootTarget) or needsPose(child) for child in bone.children)
+
+    rewritten = {}
+    def solve(bone, parentPoses):
+        rest = bone.bone.matrix_local
+        if parentPoses is None:
+            bases = [rest] * len(stream)
+        else:
+            relRest = bone.parent.bone.matrix_local.inverted() @ rest
+            bases = [pose @ relRest for pose in parentPoses]
+
+        if bone.name in dirty:
+            targetName = targets[bone.name]
+            restDir = None
+            if bonesDefinition[targetName][2] is not None :
+                restDir = (bonesDefinition[targetName][2] @ rest).rotation_difference(Vector((0,1,0)))
+            rotations = []
+            previous = None
+            for base, joints in zip(bases, stream):
+                boneV = boneDirection(joints, targetName)
+                if boneV is None:
+                    rotations.append(None)
+                    continue
+                boneV = boneV @ base
+                if restDir is not None:
+                    boneV.rotate(restDir)
+                rot = Vector((0,1,0)).rotation_difference(boneV)
+                # keep quaternions in the same hemisphere for interpolation
+                if previous is not None and previous.dot(rot) < 0:
+                    rot.negate()
+                rotations.append(rot)
+                previous = rot
+            take.rotations[bone.name] = (keys[bone.name], rotations)
+            rewritten[(bone.name, "rotation_quaternion")] = rotations
+
+        if bone.name == rootTarget and locationDirty:
+            joint = jointType[bonesDefinition[props.rootBone][0]]
+            ffp = None
+            locations = []
+            for base, joints in zip(bases, stream):
+                head = joints[joint]
+                if boneDirection(joints, props.rootBone) is None:
+                    locations.append(None)
+                    continue
+                # same as live capture, relatively to the first tracked position
+                if ffp is None:
+                    ffp = (-head[0], head[2], head[1])
+                tx, ty, tz = rest.translation[0], rest.translation[2], rest.translation[1]
+                if not props.lockwidth:
+                    tx += -head[0] - ffp[0]
+                if not props.lockHeight:
+                    ty += head[1] - ffp[2]
+                if not props.lockDepth:
+                    tz += head[2] - ffp[1]
+                locations.append(base.inverted() @ Vector((tx, tz, ty)))
+            if take.locations is not None and take.locations[1] != bone.name:
+                rewritten[(take.locations[1], "location")] = [None] * len(stream)
+            take.locations = (locationKey, bone.name, locations)
+            rewritten[(bone.name, "location")] = locations
+
+        if needsPose(bone):
+            rotations = take.rotations[bone.name][1] if bone.name in targets else None
+            locations = take.locations[2] if take.locations is not None and take.locations[1] == bone.name else None
+            rot, loc = Quaternion(), Vector((0, 0, 0))
+            poses = []
+            for i, base in enumerate(bases):
+                if rotations is not None and rotations[i] is not None:
+                    rot = rotations[i]
+                if locations is not None and locations[i] is not None:
+                    loc = locations[i]
+                poses.append(base @ Matrix.Translation(loc) @ rot.to_matrix().to_4x4())
+            for child in bone.children:
+                solve(child, poses)
+
+    for root in roots:
+        solve(root, None)
+
+    # bones not mapped anymore lose the keys of the take
+    for name in list(take.rotations):
+        if name not in targets:
+            del take.rotations[name]
+            rewritten[(name, "rotation_quaternion")] = [None] * len(stream)
+    if rootTarget is None and take.locations is not None:
+        rewritten[(take.locations[1], "location")] = [None] * len(stream)
+        take.locations = None
+
+    action = armatureAction(arma)
+    for (boneName, channel), values in rewritten.items():
+        if channel == "rotation_quaternion" and values and boneName in arma.pose.bones:
+            arma.pose.bones[boneName].rotation_mode = 'QUATERNION'
+        writeTakeCurves(action, take, boneName, channel, values)
+    return len(rewritten)
 
 ###############################################
 #                    UI
@@ -337,17 +1538,75 @@ class KMC_PT_KinectMocapPanel(bpy.types.Panel):
             # denoising strength
             layout.separator()
             layout.prop(context.scene.kmc_props, "kalmanStrength")
+            layout.prop(context.scene.kmc_props, "prediction")
+            if context.scene.kmc_props.prediction != "Off":
+                row = layout.row()
+                row.prop(context.scene.kmc_props, "predictionLatency")
+                row.prop(context.scene.kmc_props, "predictionCap")
+            
+            # load shedding
+            layout.separator()
+            layout.prop(context.scene.kmc_props, "tickBudget")
+            
+            # joint data source
+            layout.separator()
+            layout.prop(context.scene.kmc_props, "backend")
+            if context.scene.kmc_props.backend == "Synthetic":
+                box = layout.box()
+                box.prop(context.scene.kmc_props, "synthBodies")
+                box.prop(context.scene.kmc_props, "synthFps")
+                box.prop(context.scene.kmc_props, "synthNoise")
+                box.prop(context.scene.kmc_props, "synthDropout")
+            elif context.scene.kmc_props.backend == "Fusion":
+                box = layout.box()
+                for i, source in enumerate(context.scene.kmc_props.sources):
+                    row = box.row()
+                    row.prop(source, "enabled", text="")
+                    row.prop(source, "address", text="")
+                    row.operator("kmc.remove_source", text="", icon='X').index = i
+                    if source.enabled:
+                        col = box.column()
+                        col.prop(source, "location")
+                        col.prop(source, "rotation")
+                        col.prop(source, "timeOffset")
+                box.operator("kmc.add_source", icon='ADD')
+                if context.scene.kmc_props.isTracking and isinstance(context.scene.k_sensor, FusionSensor):
+                    for reader in context.scene.k_sensor.readers:
+                        if reader.error is not None:
+                            box.label(text="%s : %s" % (reader.address, reader.error), icon='ERROR')
+            layout.prop(context.scene.kmc_props, "nodePort")
+            
+            # capture display
+            layout.separator()
+            row = layout.row()
+            row.prop(context.scene.kmc_props, "lightDisplay")
+            if context.scene.kmc_props.lightDisplay:
+                row.prop(context.scene.kmc_props, "overlayFps")
             
             # activate
             layout.separator()
             layout.operator("kmc.start")
+            if takes["last"] is not None or "kmc_take" in context.scene:
+                row = layout.row()
+                row.operator("kmc.resolve")
+                row.operator("kmc.export_take", text="", icon='EXPORT')
+                layout.prop(context.scene.kmc_props, "recordPrecision")
 
             box = layout.box()
             box.alignment = 'CENTER'
             if context.scene.kmc_props.isTracking:
                 box.label(text="Status : tracking")
+                box.label(text="Tick : %.1f ms (max %.1f ms)" % (captureStats["lastTickTime"] * 1000, captureStats["maxTickTime"] * 1000))
+                if context.scene.kmc_props.tickBudget > 0:
+                    box.label(text="Shed : %d pose writes, %d keyings, %d extremities" % (captureStats["shedPoseWrites"], captureStats["shedKeys"], captureStats["shedExtremities"]))
+                if context.scene.kmc_props.prediction == "Auto":
+                    box.label(text="Prediction : %.0f ms" % (predictionLead(context) * 1000))
+                if nodeState["server"] is not None:
+                    box.label(text="Node : %d hosts connected" % len(nodeState["clients"]))
             else:
                 box.label(text="Status : stopped")
+                if nativeModule is not None:
+                    box.label(text="Native module loaded in %.0f ms" % (startupStats["nativeImport"] * 1000))
             
     def __del__(self):
         pass
@@ -369,13 +1628,140 @@ class KMC_OT_KmcInitOperator(bpy.types.Operator):
                 newTarget.value = ""
         return {'FINISHED'}
 
+# add a fusion source
+class KMC_OT_KmcAddSourceOperator(bpy.types.Operator):
+    bl_idname = "kmc.add_source"
+    bl_label = "Add source"
+    
+    def execute(self, context):
+        context.scene.kmc_props.sources.add()
+        return {'FINISHED'}
+
+# remove a fusion source
+class KMC_OT_KmcRemoveSourceOperator(bpy.types.Operator):
+    bl_idname = "kmc.remove_source"
+    bl_label = "Remove source"
+    
+    index : bpy.props.IntProperty()
+    
+    def execute(self, context):
+        context.scene.kmc_props.sources.remove(self.index)
+        return {'FINISHED'}
+
+# solve the last take again with the current settings
+class KMC_OT_KmcResolveTakeOperator(bpy.types.Operator):
+    bl_idname = "kmc.resolve"
+    bl_label = "Re-solve last take"
+    
+    @classmethod
+    def poll(cls, context):
+        return (takes["last"] is not None or "kmc_take" in context.scene) and not context.scene.kmc_props.isTracking
+    
+    def execute(self, context):
+        take = lastTake(context)
+        if take.armature not in bpy.data.objects:
+            self.report({'ERROR'}, "Armature of the take not found : " + take.armature)
+            return {'CANCELLED'}
+        if context.scene.kmc_props.arma_list != take.armature:
+            self.report({'ERROR'}, "The take was recorded on " + take.armature + ", select this armature to re-solve it")
+            return {'CANCELLED'}
+        start = perf_counter()
+        count = solveTake(context, take)
+        self.report({'INFO'}, "%d channels rewritten in %.2f s" % (count, perf_counter() - start))
+        return {'FINISHED'}
+
+# save the raw stream of the last take, e.g. as a fusion source
+class KMC_OT_KmcExportTakeOperator(bpy.types.Operator):
+    bl_idname = "kmc.export_take"
+    bl_label = "Export last take"
+    
+    filepath : bpy.props.StringProperty(subtype='FILE_PATH')
+    
+    @classmethod
+    def poll(cls, context):
+        return takes["last"] is not None or "kmc_take" in context.scene
+    
+    def invoke(self, context, event):
+        if not self.filepath:
+            self.filepath = "take.kmc"
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def execute(self, context):
+        take = lastTake(context)
+        data = take.encode(context.scene.kmc_props.recordPrecision)
+        with open(bpy.path.abspath(self.filepath), "wb") as f:
+            f.write(data)
+        self.report({'INFO'}, "%d frames, %d bytes" % (len(take.frames), len(data)))
+        return {'FINISHED'}
+
 # timer function
 def captureFrame(context):
     framerate = 1.0 / context.scene.kmc_props.fps
+    tickStart = perf_counter()
+    sensor = context.scene.k_sensor
+    newFrame = sensor.update() == 1
     
-    if(context.scene.k_sensor.update() == 1):
+    if newFrame:
         # update pose
-        updatePose(context, bpy.data.objects[context.scene.kmc_props.arma_list].pose.bones[0])
+        targets = {}
+        for target in context.scene.kmc_props.targetBones:
+            if target.value is not None and target.value != "" :
+                targets[target.value] = target.name
+        shedLevel = captureStats["shedLevel"]
+        skipped = ()
+        if shedLevel >= 3 and captureStats["frames"] % 2:
+            skipped = extremityBones
+            captureStats["shedExtremities"] += 1
+        if shedLevel >= 2:
+            captureStats["shedKeys"] += 1
+        if shedLevel >= 1:
+            captureStats["shedPoseWrites"] += 1
+        # prediction is for live monitoring only, recorded keys come from a solve without it
+        lead = predictionLead(context)
+        keyBuffer = None
+        if lead > 0 and context.scene.tool_settings.use_keyframe_insert_auto:
+            sensor.setPrediction(0.0, 0.0)
+            keyBuffer = PoseBuffer(context)
+            updatePose(context, keyBuffer.arma.pose.bones[0], keyBuffer, targets, skipped)
+        sensor.setPrediction(lead, context.scene.kmc_props.predictionCap)
+        poseBuffer = PoseBuffer(context)
+        updatePose(context, poseBuffer.arma.pose.bones[0], poseBuffer, targets, skipped)
+        # the light display writes the pose at its own rate
+        poseBuffer.apply(context, shedLevel, keyBuffer, overlayState["handler"] is not None)
+
+        serveFrame(sensor)
+        if context.scene.tool_settings.use_keyframe_insert_auto and takes["recording"] is not None:
+            takes["recording"].record(context.scene.frame_current, [sensor.getRawJoint(j) for j in range(25)], tickStart)
+
+        # loop latency : timer lag, processing time and average age of the sensor frame when polled
+        if captureStats["lastFrame"] is not None:
+            interval = tickStart - captureStats["lastFrame"]
+            captureStats["frameInterval"] += latencySmoothing * (interval - captureStats["frameInterval"])
+        captureStats["lastFrame"] = tickStart
+        lag = tickStart - captureStats["nextTick"] if captureStats["nextTick"] is not None else 0.0
+        latency = max(0.0, lag) + perf_counter() - tickStart + captureStats["frameInterval"] / 2
+        captureStats["loopLatency"] += latencySmoothing * (latency - captureStats["loopLatency"])
+        captureStats["frames"] += 1
+
+    # catch up with queued keys
+    budget = context.scene.kmc_props.tickBudget / 1000.0
+    if pendingKeys and captureStats["shedLevel"] < 2:
+        flushKeys(bpy.data.objects[context.scene.kmc_props.arma_list], flushBatch)
+
+    tickTime = perf_counter() - tickStart
+    if budget <= 0:
+        captureStats["shedLevel"] = 0
+    elif newFrame:
+        # ticks without a new frame (capture faster than the source) are always short and don't change the level
+        if tickTime > budget:
+            captureStats["shedLevel"] = min(captureStats["shedLevel"] + 1, 3)
+        elif tickTime < budget / 2:
+            captureStats["shedLevel"] = max(captureStats["shedLevel"] - 1, 0)
+    captureStats["ticks"] += 1
+    captureStats["lastTickTime"] = tickTime
+    captureStats["maxTickTime"] = max(captureStats["maxTickTime"], tickTime)
+    captureStats["nextTick"] = perf_counter() + framerate
 
     if context.scene.kmc_props.stopTracking:
         context.scene.kmc_props.stopTracking = False
@@ -383,6 +1769,20 @@ def captureFrame(context):
     else:
         return framerate
 
+# the capture timer doesn't survive a file load, neither does the tracking state saved in the file
+@bpy.app.handlers.persistent
+def stopTrackingOnLoad(dummy):
+    if bpy.types.Scene.k_sensor is not None:
+        bpy.types.Scene.k_sensor.close()
+        bpy.types.Scene.k_sensor = None
+    stopLightDisplay()
+    stopNode()
+    shedPose.clear()
+    pendingKeys.clear()
+    for scene in bpy.data.scenes:
+        scene.kmc_props.isTracking = False
+        scene.kmc_props.stopTracking = False
+
 # start tracking
 class KMC_OT_KmcStartTrackingOperator(bpy.types.Operator):
     bl_idname = "kmc.start"
@@ -393,24 +1793,46 @@ class KMC_OT_KmcStartTrackingOperator(bpy.types.Operator):
         if context.scene.kmc_props.isTracking:
             context.scene.kmc_props.stopTracking = True
             context.scene.kmc_props.isTracking = False
-            context.scene.k_sensor.close()
+            # no sensor if the tracking state was saved in the file
+            if context.scene.k_sensor is not None:
+                context.scene.k_sensor.close()
+            stopLightDisplay()
+            stopNode()
+            if shedPose:
+                # write the last solved pose
+                PoseBuffer(context).write()
+            if pendingKeys:
+                flushKeys(bpy.data.objects[context.scene.kmc_props.arma_list])
+            stopTake(context)
 
         else:
+            sensor = createSensor(context)
+            if sensor is None:
+                self.report({'ERROR'}, "Kinect module unavailable (Kinect for Windows SDK 2.0 required)")
+                return {'CANCELLED'}
+            bpy.types.Scene.k_sensor = sensor
+            if context.scene.kmc_props.nodePort > 0:
+                try:
+                    startNode(context.scene.kmc_props.nodePort)
+                except OSError as e:
+                    self.report({'ERROR'}, "Capture node unavailable on port %d : %s" % (context.scene.kmc_props.nodePort, e))
+                    return {'CANCELLED'}
+
             # init system
             initialize(context)
         
-            uNoise = 5.0
-            if context.scene.kmc_props.kalmanStrength == "VeryLow" :
-                uNoise=50.0
-            elif context.scene.kmc_props.kalmanStrength == "Low" :
-                uNoise=20.0
-            elif context.scene.kmc_props.kalmanStrength == "Normal" :
-                uNoise=5.0
-            elif context.scene.kmc_props.kalmanStrength == "Strong" :
-                uNoise=1.0
-            context.scene.k_sensor.init(1.0 / context.scene.kmc_props.fps, 0.0005, uNoise)
+            uNoise = kalmanNoise[context.scene.kmc_props.kalmanStrength]
+            # the Kinect can't step faster than its own frame rate, other sources measure their step
+            dt = 1.0 / min(context.scene.kmc_props.fps, kinectFps)
+            context.scene.k_sensor.init(dt, kalmanSensorNoise, uNoise)
+            startTake(context)
+            shedPose.clear()
+            captureStats.update(ticks=0, frames=0, lastTickTime=0.0, maxTickTime=0.0, nextTick=None, lastFrame=None, frameInterval=0.0, loopLatency=0.0,
+                shedLevel=0, shedPoseWrites=0, shedKeys=0, shedExtremities=0)
             bpy.app.timers.register(functools.partial(captureFrame, context))
             context.scene.kmc_props.isTracking = True
+            if context.scene.kmc_props.lightDisplay:
+                startLightDisplay(context)
 
         return {'FINISHED'}
 
@@ -421,19 +1843,39 @@ class KMC_OT_KmcStartTrackingOperator(bpy.types.Operator):
 
 classes = (
     KMC_PG_KmcTarget,
+    KMC_PG_KmcSource,
     KMC_PG_KmcProperties,
     KMC_PT_KinectMocapPanel,
     KMC_OT_KmcInitOperator,
+    KMC_OT_KmcAddSourceOperator,
+    KMC_OT_KmcRemoveSourceOperator,
+    KMC_OT_KmcResolveTakeOperator,
+    KMC_OT_KmcExportTakeOperator,
     KMC_OT_KmcStartTrackingOperator
 )
 
 def register():
+    start = perf_counter()
     for c in classes :
         bpy.utils.register_class(c)
-    bpy.types.Scene.k_sensor = kinectMocap4Blender.Sensor()
+    # the sensor is created when tracking starts
+    bpy.types.Scene.k_sensor = None
     bpy.types.Scene.kmc_props = bpy.props.PointerProperty(type=KMC_PG_KmcProperties)
+    bpy.app.handlers.load_post.append(clearTakes)
+    bpy.app.handlers.load_post.append(stopTrackingOnLoad)
+    bpy.app.handlers.save_pre.append(restoreDeformationOnSave)
+    bpy.app.handlers.save_post.append(suspendDeformationAfterSave)
+    startupStats["register"] = perf_counter() - start
+    if bpy.app.debug:
+        print("Kinect MoCap add-on registered in %.1f ms" % (startupStats["register"] * 1000))
 
 def unregister():
+    stopLightDisplay()
+    stopNode()
+    bpy.app.handlers.load_post.remove(clearTakes)
+    bpy.app.handlers.load_post.remove(stopTrackingOnLoad)
+    bpy.app.handlers.save_pre.remove(restoreDeformationOnSave)
+    bpy.app.handlers.save_post.remove(suspendDeformationAfterSave)
     for c in reversed(classes) :
         bpy.utils.register_class(c)
     bpy.utils.unregister_module(__name__)